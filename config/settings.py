@@ -2,56 +2,161 @@
 Configuration settings for Biblical RAG Chatbot
 """
 import os
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+
+def _env_flag(name: str, default: str) -> bool:
+    """Read a boolean flag such as RAG_WARMUP=1 from the environment"""
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Application configuration class"""
-    
+    """Application configuration, read from the environment once at import"""
+
     # API Keys
-    GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-    HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
+    GOOGLE_API_KEY: Optional[str]
+    OPENAI_API_KEY: Optional[str]
+    ANTHROPIC_API_KEY: Optional[str]
+    HUGGINGFACE_API_KEY: Optional[str]
 
     # LangSmith Configuration
-    LANGSMITH_API_KEY = os.getenv("LANGSMITH_API_KEY")
-    LANGSMITH_TRACING = os.getenv("LANGSMITH_TRACING")
-    LANGSMITH_PROJECT = os.getenv("LANGSMITH_PROJECT", "biblica-assistant")
-    
+    LANGSMITH_API_KEY: Optional[str]
+    LANGSMITH_TRACING: Optional[str]
+    LANGSMITH_PROJECT: str
+
     # Paths
-    BASE_DIR = Path(__file__).parent.parent
-    DATA_DIR = BASE_DIR / "data"
-    CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", str(DATA_DIR / "chroma_db"))
-    BIBLE_DATA_PATH = os.getenv("BIBLE_DATA_PATH", str(DATA_DIR / "KJV.json"))
-    
+    BASE_DIR: Path
+    DATA_DIR: Path
+    CHROMA_DB_PATH: str
+    CHROMA_DB_DIR: Path  # CHROMA_DB_PATH as a Path
+    CHROMA_READY_FILE: Path  # Written once the vector store has been fully built
+    CHROMA_MANIFEST_FILE: Path  # Source data hash and index settings the vector store was built from
+    BIBLE_DATA_PATH: str
+    VERSE_CACHE_PATH: Path  # Columnar (Arrow IPC) verse table, rebuilt when BIBLE_DATA_PATH changes
+    PROMPT_CACHE_PATH: Path  # Last prompt pulled from LangSmith Hub, used at startup
+    EMBEDDING_CACHE_PATH: Path  # int8-quantized embeddings keyed by text digest, kept across rebuilds (approximate)
+
     # App Configuration
-    APP_TITLE = os.getenv("APP_TITLE", "Biblica Assistant")
-    APP_ICON = os.getenv("APP_ICON", "✝️")
-    
+    APP_TITLE: str
+    APP_ICON: str
+
     # Model Configuration
-    DEFAULT_MODEL = "gemini-2.0-flash"
-    MAX_TOKENS = int(os.getenv("MAX_TOKENS", "1000"))
-    TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
-    
+    DEFAULT_MODEL: str
+    EMBEDDING_BACKEND: str  # "google" (Gemini API) or "huggingface" (local sentence-transformers)
+    EMBEDDING_MODEL: str
+    EMBED_BATCH_SIZE: int  # Texts per embedding call while indexing; 0 picks a default for the backend
+    EMBED_WORKERS: int  # Processes for the local embedding model while indexing (1 = in-process)
+    EMBED_CONCURRENCY: int  # Embedding API requests in flight while indexing (google backend)
+    MAX_TOKENS: int
+    TEMPERATURE: float
+
     # RAG Configuration
-    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
-    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
-    RETRIEVAL_K = 5  # Number of documents to retrieve
-    
-    # Ensure directories exist
-    DATA_DIR.mkdir(exist_ok=True)
-    
+    CHUNK_SIZE: int
+    CHUNK_OVERLAP: int
+    RETRIEVAL_K: int  # Number of documents to retrieve
+    HYBRID_SEARCH: bool  # Fuse BM25 keyword matches with dense results (needs rank_bm25)
+    RERANKER_MODEL: str  # Cross-encoder for reranking retrieved verses; empty disables reranking
+    VECTOR_STORE: str  # "chroma" (HNSW index) or "flat" (exact brute-force search)
+    VECTOR_DTYPE: str  # Precision of vectors in the flat store: "float32" or "float16" (half the size)
+    HNSW_M: int  # Graph links per node in the Chroma index
+    HNSW_CONSTRUCTION_EF: int  # Candidate list size while building the index
+    HNSW_SEARCH_EF: int  # Candidate list size per query; stored with the index, can change without a rebuild
+    HNSW_NUM_THREADS: int  # Threads used to build the index
+    RAG_WARMUP: bool  # Warm index after load
+    ANSWER_CACHE_SIZE: int  # Answers kept in memory per engine (0 disables the cache)
+    SEMANTIC_CACHE: bool  # Also reuse answers of differently worded but equivalent questions
+    SEMANTIC_CACHE_THRESHOLD: float  # Minimum cosine similarity between question embeddings
+    RUN_SMOKE_TEST: bool  # Ask the LLM a test question after setup (otherwise only retrieval is checked)
+
     @classmethod
-    def validate_config(cls):
+    def _load(cls) -> "Config":
+        """Build the configuration from environment variables"""
+        base_dir = Path(__file__).parent.parent
+        data_dir = base_dir / "data"
+        chroma_db_path = os.getenv("CHROMA_DB_PATH", str(data_dir / "chroma_db"))
+        user_cache_dir = Path(os.getenv("XDG_CACHE_HOME", str(Path.home() / ".cache"))) / "chatzbible"
+        embedding_backend = os.getenv("EMBEDDING_BACKEND", "google").lower()
+        default_embedding_model = {
+            "google": "models/embedding-001",
+            "huggingface": "sentence-transformers/all-MiniLM-L6-v2",
+        }.get(embedding_backend, "")
+
+        # Ensure directories exist
+        data_dir.mkdir(exist_ok=True)
+
+        return cls(
+            GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY"),
+            OPENAI_API_KEY=os.getenv("OPENAI_API_KEY"),
+            ANTHROPIC_API_KEY=os.getenv("ANTHROPIC_API_KEY"),
+            HUGGINGFACE_API_KEY=os.getenv("HUGGINGFACE_API_KEY"),
+
+            LANGSMITH_API_KEY=os.getenv("LANGSMITH_API_KEY"),
+            LANGSMITH_TRACING=os.getenv("LANGSMITH_TRACING"),
+            LANGSMITH_PROJECT=os.getenv("LANGSMITH_PROJECT", "biblica-assistant"),
+
+            BASE_DIR=base_dir,
+            DATA_DIR=data_dir,
+            CHROMA_DB_PATH=chroma_db_path,
+            CHROMA_DB_DIR=Path(chroma_db_path),
+            CHROMA_READY_FILE=Path(chroma_db_path) / ".ready",
+            CHROMA_MANIFEST_FILE=Path(chroma_db_path) / ".manifest.json",
+            BIBLE_DATA_PATH=os.getenv("BIBLE_DATA_PATH", str(data_dir / "KJV.json")),
+            VERSE_CACHE_PATH=data_dir / "verses.arrow",
+            PROMPT_CACHE_PATH=Path(os.getenv("PROMPT_CACHE_PATH", str(user_cache_dir / "prompt.json"))),
+            EMBEDDING_CACHE_PATH=data_dir / "embeddings.i8.npy",
+
+            APP_TITLE=os.getenv("APP_TITLE", "Biblica Assistant"),
+            APP_ICON=os.getenv("APP_ICON", "✝️"),
+
+            DEFAULT_MODEL="gemini-2.0-flash",
+            EMBEDDING_BACKEND=embedding_backend,
+            EMBEDDING_MODEL=os.getenv("EMBEDDING_MODEL", default_embedding_model),
+            EMBED_BATCH_SIZE=int(os.getenv("EMBED_BATCH_SIZE", "0")),
+            EMBED_WORKERS=int(os.getenv("EMBED_WORKERS", "1")),
+            EMBED_CONCURRENCY=int(os.getenv("EMBED_CONCURRENCY", "8")),
+            MAX_TOKENS=int(os.getenv("MAX_TOKENS", "1000")),
+            TEMPERATURE=float(os.getenv("TEMPERATURE", "0.7")),
+
+            CHUNK_SIZE=int(os.getenv("CHUNK_SIZE", "1000")),
+            CHUNK_OVERLAP=int(os.getenv("CHUNK_OVERLAP", "200")),
+            RETRIEVAL_K=5,
+            HYBRID_SEARCH=_env_flag("HYBRID_SEARCH", "0"),
+            RERANKER_MODEL=os.getenv("RERANKER_MODEL", ""),
+            VECTOR_STORE=os.getenv("VECTOR_STORE", "chroma").lower(),
+            VECTOR_DTYPE=os.getenv("VECTOR_DTYPE", "float32").lower(),
+            HNSW_M=int(os.getenv("HNSW_M", "16")),
+            HNSW_CONSTRUCTION_EF=int(os.getenv("HNSW_CONSTRUCTION_EF", "200")),
+            HNSW_SEARCH_EF=int(os.getenv("HNSW_SEARCH_EF", "40")),
+            HNSW_NUM_THREADS=int(os.getenv("HNSW_NUM_THREADS", str(os.cpu_count() or 1))),
+            RAG_WARMUP=_env_flag("RAG_WARMUP", "1"),
+            ANSWER_CACHE_SIZE=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+            SEMANTIC_CACHE=_env_flag("SEMANTIC_CACHE", "0"),
+            SEMANTIC_CACHE_THRESHOLD=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+            RUN_SMOKE_TEST=_env_flag("RUN_SMOKE_TEST", "0"),
+        )
+
+    def validate_config(self):
         """Validate required configuration"""
-        if not cls.GOOGLE_API_KEY:
+        if not self.GOOGLE_API_KEY:
             raise ValueError("GOOGLE_API_KEY is required. Please set it in your .env file")
         
+        if self.VECTOR_STORE not in ("chroma", "flat"):
+            raise ValueError(f"Unknown VECTOR_STORE '{self.VECTOR_STORE}'. Use 'chroma' or 'flat'")
+        
+        if self.VECTOR_DTYPE not in ("float32", "float16"):
+            raise ValueError(f"Unknown VECTOR_DTYPE '{self.VECTOR_DTYPE}'. Use 'float32' or 'float16'")
+        
+        if self.EMBEDDING_BACKEND not in ("google", "huggingface"):
+            raise ValueError(f"Unknown EMBEDDING_BACKEND '{self.EMBEDDING_BACKEND}'. Use 'google' or 'huggingface'")
+
         return True
 
 # Create config instance
-config = Config() 
\ No newline at end of file
+config = Config._load()
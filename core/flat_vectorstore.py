@@ -0,0 +1,191 @@
+"""
+Exact (brute-force) vector store for small corpora
+Keeps every vector in one contiguous float32 (or float16) matrix and scores a query with matmuls
+"""
+import json
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+class FlatVectorStore(VectorStore):
+    """
+    In-memory exact nearest-neighbour search over L2-normalized vectors
+
+    At ~31k verses a full inner-product scan is sub-millisecond with BLAS and has
+    perfect recall, so no approximate index is needed. Persisted as one .npy matrix
+    plus a JSON file with ids, texts and metadata.
+    """
+
+    VECTORS_FILE = "flat_vectors.npy"
+    DOCUMENTS_FILE = "flat_documents.json"
+
+    # Rows scored per block when vectors are stored in reduced precision
+    SCORE_BLOCK_ROWS = 8192
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        persist_directory: Optional[str] = None,
+        dtype: str = "float32",
+    ):
+        self._embedding = embedding
+        self.persist_directory = Path(persist_directory) if persist_directory else None
+        self.dtype = np.dtype(dtype)
+
+        self._vectors = None
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def count(self) -> int:
+        """Number of stored documents"""
+        return len(self._ids)
+
+    def get(self, **kwargs: Any) -> dict:
+        """All stored ids, texts and metadata, in the same shape as Chroma.get()"""
+        return {"ids": list(self._ids), "documents": list(self._texts), "metadatas": list(self._metadatas)}
+
+    def add_embeddings(
+        self,
+        ids: List[str],
+        texts: List[str],
+        vectors: np.ndarray,
+        metadatas: List[dict],
+    ) -> List[str]:
+        """Add documents whose embeddings were computed elsewhere"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = (vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)).astype(self.dtype)
+
+        if self._vectors is None:
+            self._vectors = vectors
+        else:
+            self._vectors = np.concatenate([self._vectors, vectors])
+
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._metadatas.extend(metadatas)
+        return list(ids)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Embed and add texts"""
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(len(self._ids) + i) for i in range(len(texts))]
+        return self.add_embeddings(ids, texts, self._embedding.embed_documents(texts), metadatas)
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        """Return the top-k documents with their cosine similarity to the given vector"""
+        if not self._ids:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) + 1e-12)
+        scores = self._score(query)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            (
+                Document(page_content=self._texts[i], metadata=self._metadatas[i], id=self._ids[i]),
+                float(scores[i]),
+            )
+            for i in top
+        ]
+
+    def _score(self, query: np.ndarray) -> np.ndarray:
+        """Inner product of every stored vector with the query"""
+        if self._vectors.dtype == np.float32:
+            return self._vectors @ query
+
+        # numpy has no BLAS kernel for float16; widen one block at a time instead
+        scores = np.empty(len(self._vectors), dtype=np.float32)
+        for start in range(0, len(self._vectors), self.SCORE_BLOCK_ROWS):
+            block = self._vectors[start:start + self.SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        return scores
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] mapped onto [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def persist(self):
+        """Write vectors and documents to persist_directory"""
+        if self.persist_directory is None:
+            raise ValueError("No persist_directory configured")
+
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        np.save(self.persist_directory / self.VECTORS_FILE, self._vectors)
+        with open(self.persist_directory / self.DOCUMENTS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(
+                {"ids": self._ids, "texts": self._texts, "metadatas": self._metadatas},
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, embedding: Embeddings, persist_directory: str) -> Optional["FlatVectorStore"]:
+        """Load a persisted store in the precision it was saved with, or return None if there is none"""
+        store = cls(embedding, persist_directory)
+        vectors_path = store.persist_directory / cls.VECTORS_FILE
+        documents_path = store.persist_directory / cls.DOCUMENTS_FILE
+
+        if not vectors_path.exists() or not documents_path.exists():
+            return None
+
+        with open(documents_path, 'r', encoding='utf-8') as f:
+            documents = json.load(f)
+
+        store._vectors = np.load(vectors_path, mmap_mode='r')
+        store.dtype = store._vectors.dtype
+        store._ids = documents["ids"]
+        store._texts = documents["texts"]
+        store._metadatas = documents["metadatas"]
+        return store
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        persist_directory: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "FlatVectorStore":
+        store = cls(embedding, persist_directory)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        if persist_directory:
+            store.persist()
+        return store
@@ -0,0 +1,41 @@
+"""
+Scalar quantization for persisted embeddings
+Stores vectors as int8 codes with one scale per vector (about 4x smaller than float32)
+"""
+import numpy as np
+
+
+def quantize_int8(vectors: np.ndarray):
+    """
+    L2-normalize vectors and quantize each one to int8 with its own scale
+
+    Per-vector scales let new rows be quantized and appended without touching the
+    codes of rows quantized earlier.
+
+    Args:
+        vectors: (N, D) float array
+
+    Returns:
+        Tuple of (int8 codes, (N, 1) float32 scales) where codes / scales approximates
+        the normalized vectors
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+    scales = 127.0 / np.maximum(np.abs(vectors).max(axis=1, keepdims=True), 1e-12)
+    codes = np.round(vectors * scales).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class Int8Vectors:
+    """Read-only view over int8 codes that dequantizes to float32 on slicing"""
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = codes
+        self.scales = scales
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index) -> np.ndarray:
+        return np.asarray(self.codes[index], dtype=np.float32) / self.scales[index]
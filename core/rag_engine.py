@@ -3,24 +3,102 @@ Core RAG Engine for Biblical Chatbot
 Handles document loading, embedding, retrieval, and answer generation
 """
 import os
-from typing import List, Dict, Optional
-from pathlib import Path
+import json
+import asyncio
+import hashlib
+import io
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from functools import cached_property
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
 
-import pysqlite3
 import sys
-sys.modules["sqlite3"] = sys.modules["pysqlite3"]
+try:
+    import pysqlite3
+    sys.modules["sqlite3"] = sys.modules["pysqlite3"]
+except ImportError:
+    # Only needed where the system sqlite3 is too old for Chroma
+    pass
 
-from langchain.chat_models import init_chat_model
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langsmith import traceable, Client
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.vectorstores import VectorStore
+from langsmith import traceable
 
 
 from config.settings import config
+from core.quantization import quantize_int8, Int8Vectors
+from core.flat_vectorstore import FlatVectorStore
+from core.semantic_cache import SemanticCache
+
+
+# Texts per embed_documents() call for Gemini; its batch embedding endpoint accepts up to 100
+EMBED_BATCH_SIZE = 100
+
+# Cached answers are replayed to streaming callers in pieces of this size, with a short
+# pause in between so they render like a live response
+REPLAY_CHUNK_CHARS = 40
+REPLAY_CHUNK_DELAY = 0.01
+
+# Candidates fetched per kept document when a reranker is configured
+RERANK_FETCH_FACTOR = 4
+
+# Hybrid search: candidates fetched per kept document from each retriever, and the
+# Reciprocal Rank Fusion constant (score = sum of 1 / (RRF_K + rank))
+HYBRID_FETCH_FACTOR = 5
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Recent question embeddings kept so the semantic cache and the retriever share one embed call
+QUERY_VECTOR_CACHE_SIZE = 64
+
+# Local embedding model of an EMBED_WORKERS process, loaded once by _init_embed_worker
+_worker_embeddings = None
+
+
+def _init_embed_worker(model_name: str, encode_batch_size: int):
+    """Load the local embedding model in a worker process, limited to one CPU thread"""
+    global _worker_embeddings
+    os.environ["OMP_NUM_THREADS"] = "1"
+    os.environ["MKL_NUM_THREADS"] = "1"
+    
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+    
+    torch.set_num_threads(1)
+    _worker_embeddings = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"batch_size": encode_batch_size, "normalize_embeddings": True}
+    )
+
+
+def _embed_in_worker(texts: List[str]) -> np.ndarray:
+    """Embed one batch in a worker process"""
+    return np.asarray(_worker_embeddings.embed_documents(texts), dtype=np.float32)
+
+
+class _locked_cached_property(cached_property):
+    """
+    cached_property whose first computation holds the instance's _init_lock
+    
+    One engine is shared by every Streamlit session, and cached_property stopped locking
+    in Python 3.12, so concurrent first requests could otherwise load a model twice.
+    """
+    
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        
+        with instance._init_lock:
+            return super().__get__(instance, owner)
 
 
 class BiblicalRAGEngine:
@@ -29,51 +107,123 @@ class BiblicalRAGEngine:
     """
     
     def __init__(self):
-        """Initialize the RAG engine with default components"""
+        """
+        Initialize the RAG engine
+        
+        The LLM, embeddings, prompt, text splitter and reranker are created on first
+        use, so callers that never need them (e.g. get_stats) don't import them.
+        """
         config.validate_config()
         
+        # Guards the first creation of the lazy components below; reentrant because
+        # some of them use others (e.g. embed_batch_size reads embeddings)
+        self._init_lock = threading.RLock()
+        
         # Initialize components
-        self.llm = None
-        self.embeddings = None
         self.vectorstore = None
         self.retriever = None
         self.rag_chain = None
+        self.bm25 = None
+        self._keyword_docs: List[Document] = []
+        
+        # Answers keyed by normalized question, least recently used first
+        self._answer_cache: OrderedDict[str, str] = OrderedDict()
+        self._answer_cache_lock = threading.Lock()
+        self._semantic_cache = SemanticCache(
+            capacity=config.ANSWER_CACHE_SIZE,
+            threshold=config.SEMANTIC_CACHE_THRESHOLD
+        ) if config.SEMANTIC_CACHE else None
+        self._query_vectors: OrderedDict[str, List[float]] = OrderedDict()
+    
+    @_locked_cached_property
+    def text_splitter(self):
+        """Splitter for documents that aren't already atomic chunks"""
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
         
-        # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        return RecursiveCharacterTextSplitter(
             chunk_size=config.CHUNK_SIZE,
             chunk_overlap=config.CHUNK_OVERLAP,
             separators=["\n\n", "\n", ". ", " "],
             add_start_index=True,  # track index in original document
         )
+    
+    @_locked_cached_property
+    def llm(self):
+        """The language model"""
+        from langchain.chat_models import init_chat_model
         
-        # Setup components
-        self._setup_llm()
-        self._setup_embeddings()
-        self._setup_prompt()
-        
-    def _setup_llm(self):
-        """Initialize the language model"""
-        import os
         if not os.environ.get("GOOGLE_API_KEY") and config.GOOGLE_API_KEY:
             os.environ["GOOGLE_API_KEY"] = config.GOOGLE_API_KEY
         
-        self.llm = init_chat_model(
+        return init_chat_model(
             "gemini-2.0-flash", 
             model_provider="google_genai",
             # temperature=config.TEMPERATURE,
         )
     
-    def _setup_embeddings(self):
-        """Initialize embeddings model"""
-        import os
+    @_locked_cached_property
+    def embeddings(self):
+        """The embeddings model"""
+        if config.EMBEDDING_BACKEND == "huggingface":
+            return self._setup_local_embeddings()
+        
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        
         if not os.environ.get("GOOGLE_API_KEY") and config.GOOGLE_API_KEY:
             os.environ["GOOGLE_API_KEY"] = config.GOOGLE_API_KEY
         
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001"
+        return GoogleGenerativeAIEmbeddings(
+            model=config.EMBEDDING_MODEL
         )
-
+    
+    @staticmethod
+    def _local_device():
+        """Device and encode batch size for the local sentence-transformers model"""
+        import torch
+        
+        if torch.cuda.is_available():
+            return "cuda", 256
+        return "cpu", 64
+    
+    def _setup_local_embeddings(self):
+        """Initialize a local sentence-transformers model, batched on the GPU when available"""
+        from langchain_huggingface import HuggingFaceEmbeddings
+        
+        device, encode_batch_size = self._local_device()
+        return HuggingFaceEmbeddings(
+            model_name=config.EMBEDDING_MODEL,
+            model_kwargs={"device": device},
+            encode_kwargs={"batch_size": encode_batch_size, "normalize_embeddings": True}
+        )
+    
+    @_locked_cached_property
+    def embed_batch_size(self) -> int:
+        """Texts per embed_documents() call"""
+        if config.EMBED_BATCH_SIZE:
+            return config.EMBED_BATCH_SIZE
+        
+        if config.EMBEDDING_BACKEND == "huggingface":
+            # No request limit locally; hand the model several of its own batches at a time
+            return self._local_device()[1] * 4
+        return EMBED_BATCH_SIZE
+    
+    @_locked_cached_property
+    def reranker(self):
+        """The optional cross-encoder used to rerank retrieved verses, or None"""
+        if not config.RERANKER_MODEL:
+            return None
+        
+        try:
+            import torch
+            from sentence_transformers import CrossEncoder
+            
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            return CrossEncoder(config.RERANKER_MODEL, device=device)
+        except Exception as e:
+            print(f"Warning: Could not load reranker {config.RERANKER_MODEL}: {e}")
+            print("Continuing without reranking...")
+            return None
+    
     def _setup_langsmith(self):
         """Setup LangSmith tracing if configured"""
         if config.LANGSMITH_API_KEY:
@@ -86,77 +236,479 @@ class BiblicalRAGEngine:
             os.environ["LANGSMITH_PROJECT"] = config.LANGSMITH_PROJECT
         
     
-    def _setup_prompt(self):
-        """Setup the biblical RAG prompt template from LangSmith Hub"""
+    @_locked_cached_property
+    def prompt(self):
+        """
+        The biblical RAG prompt template from LangSmith Hub
+        
+        Served from the on-disk copy when there is one, with a background refresh for
+        the next start; only the first run waits on the network.
+        """
+        cached = self._load_cached_prompt()
+        if cached is not None:
+            threading.Thread(target=self._pull_prompt, daemon=True).start()
+            return cached
+        
+        prompt = self._pull_prompt()
+        if prompt is None:
+            print("Falling back to default prompt template...")
+        return prompt
+    
+    def _pull_prompt(self):
+        """Pull the prompt from LangSmith Hub and save it to the prompt cache"""
         try:
+            from langsmith import Client
             
             # Initialize LangSmith client
             client = Client()
             
             # Pull prompt from LangSmith Hub
-            self.prompt = client.pull_prompt("biblical-rag-assistant")
+            prompt = client.pull_prompt("biblical-rag-assistant")
             
         except Exception as e:
             print(f"Warning: Could not load prompt from LangSmith Hub: {e}")
-            print("Falling back to default prompt template...")
+            return None
+        
+        try:
+            from langchain_core.load import dumpd
             
+            cache_path = config.PROMPT_CACHE_PATH
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(dumpd(prompt)), encoding='utf-8')
+            tmp_path.replace(cache_path)
+        except Exception as e:
+            print(f"Warning: Could not write prompt cache: {e}")
+        
+        return prompt
     
-    def create_vectorstore(self, documents: List[Document]) -> Chroma:
+    @staticmethod
+    def _load_cached_prompt():
+        """Load the prompt saved by an earlier pull, or None if there is none"""
+        cache_path = config.PROMPT_CACHE_PATH
+        if not cache_path.exists():
+            return None
+        
+        try:
+            from langchain_core.load import load
+            
+            return load(json.loads(cache_path.read_text(encoding='utf-8')))
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable prompt cache: {e}")
+            return None
+    
+    def create_vectorstore(self, documents: Iterable[Document], presplit: bool = False) -> VectorStore:
         """
         Create and populate vector store with documents
         
         Args:
-            documents: List of Document objects to index
+            documents: Document objects to index; may be a generator, which is consumed once
+            presplit: True if documents are already atomic chunks (e.g. one per verse)
+                and should be embedded as-is instead of going through the text splitter
             
         Returns:
-            Populated Chroma vector store
+            Populated vector store (Chroma, or FlatVectorStore when VECTOR_STORE=flat)
         """
-        if not documents:
-            raise ValueError("No documents provided for indexing")
+        if presplit:
+            all_splits = documents
+        else:
+            # Split documents into chunks
+            documents = list(documents)
+            all_splits = self.text_splitter.split_documents(documents)
+            
+            print(f"Created {len(all_splits)} text chunks from {len(documents)} documents")
         
-        # Split documents into chunks
-        all_splits = self.text_splitter.split_documents(documents)
+        # Stable ids make re-seeding overwrite existing entries instead of duplicating them
+        ids, texts, metadatas = [], [], []
+        seen_ids = set()
+        for doc in all_splits:
+            doc_id = self._document_id(doc)
+            if doc_id in seen_ids:
+                continue
+            seen_ids.add(doc_id)
+            ids.append(doc_id)
+            texts.append(doc.page_content)
+            metadatas.append(doc.metadata)
         
-        print(f"Created {len(all_splits)} text chunks from {len(documents)} documents")
+        if not ids:
+            raise ValueError("No documents provided for indexing")
         
-        # Create vector store
-        self.vectorstore = Chroma.from_documents(
-            documents=all_splits,
-            embedding=self.embeddings,
-            persist_directory=config.CHROMA_DB_PATH
-        )
+        vectors = self._embed_corpus(texts)
+        
+        if config.VECTOR_STORE == "flat":
+            # Exact search: one contiguous matrix, persisted with a single np.save
+            self.vectorstore = FlatVectorStore(self.embeddings, config.CHROMA_DB_PATH, dtype=config.VECTOR_DTYPE)
+            self.vectorstore.add_embeddings(ids, texts, vectors[:], metadatas)
+            self.vectorstore.persist()
+        else:
+            self._populate_chroma(ids, texts, vectors, metadatas)
         
         # Setup retriever
         self.retriever = self.vectorstore.as_retriever(
             search_kwargs={"k": config.RETRIEVAL_K}
         )
+        self._setup_keyword_index()
         
         # Create RAG chain
         self._create_rag_chain()
         
+        # Only now is the database complete enough for the app to use
+        config.CHROMA_READY_FILE.touch()
+        
         return self.vectorstore
     
-    def load_existing_vectorstore(self) -> Optional[Chroma]:
+    def _populate_chroma(self, ids: List[str], texts: List[str], vectors, metadatas: List[Dict]):
+        """Create the Chroma vector store and add precomputed vectors to it"""
+        from langchain_chroma import Chroma
+        
+        # Vectors are stored unit-length, so inner product equals cosine similarity
+        # and the index skips the norm computations of the cosine kernel
+        self.vectorstore = Chroma(
+            persist_directory=config.CHROMA_DB_PATH,
+            embedding_function=self.embeddings,
+            collection_metadata={
+                "hnsw:space": "ip",
+                "hnsw:M": config.HNSW_M,
+                "hnsw:construction_ef": config.HNSW_CONSTRUCTION_EF,
+                "hnsw:search_ef": config.HNSW_SEARCH_EF,
+                "hnsw:num_threads": config.HNSW_NUM_THREADS,
+            }
+        )
+        
+        # Write in as few calls as the client accepts, rather than one small batch per
+        # embedding request; each call is a single SQLite transaction and index update
+        try:
+            batch_size = self.vectorstore._client.get_max_batch_size()
+        except AttributeError:
+            batch_size = len(texts)
+        
+        for start in range(0, len(texts), batch_size):
+            end = start + batch_size
+            self._upsert_vectors(ids[start:end], texts[start:end], vectors[start:end], metadatas[start:end])
+    
+    def _upsert_vectors(self, ids: List[str], texts: List[str], vectors, metadatas: List[Dict]):
+        """Upsert one batch into Chroma, splitting it in half if it is too large"""
+        batch = np.asarray(vectors, dtype=np.float32)
+        batch = batch / (np.linalg.norm(batch, axis=1, keepdims=True) + 1e-12)
+        
+        try:
+            self.vectorstore._collection.upsert(
+                ids=ids,
+                embeddings=batch,
+                documents=texts,
+                metadatas=metadatas
+            )
+        except Exception as e:
+            # Only a batch that is too large is worth splitting; data errors (duplicate ids,
+            # wrong dimension, bad metadata) would fail again in every half
+            if len(ids) <= 1 or not self._is_batch_too_large(e):
+                raise
+            
+            print(f"Batch of {len(ids)} failed ({e}), retrying in halves")
+            del batch
+            half = len(ids) // 2
+            self._upsert_vectors(ids[:half], texts[:half], vectors[:half], metadatas[:half])
+            self._upsert_vectors(ids[half:], texts[half:], vectors[half:], metadatas[half:])
+    
+    @staticmethod
+    def _is_batch_too_large(error: Exception) -> bool:
+        """True for out-of-memory and Chroma's batch size errors"""
+        if isinstance(error, MemoryError):
+            return True
+        
+        try:
+            from chromadb.errors import BatchSizeExceededError
+            if isinstance(error, BatchSizeExceededError):
+                return True
+        except ImportError:
+            pass
+        
+        # Raised as a plain ValueError by the client-side batch validation
+        return isinstance(error, ValueError) and "exceeds maximum batch size" in str(error)
+    
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in large batches, one API round-trip (or model call) per batch"""
+        # Remote batches are I/O bound, so overlap them; a local model gains nothing from it
+        if config.EMBEDDING_BACKEND == "google" and config.EMBED_CONCURRENCY > 1:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(self._embed_texts_concurrently(texts))
+        
+        # A CPU-bound local model can use every core through separate processes
+        if (config.EMBEDDING_BACKEND == "huggingface" and config.EMBED_WORKERS > 1
+                and self._local_device()[0] == "cpu"):
+            return self._embed_texts_in_processes(texts)
+        
+        vectors = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            end = start + self.embed_batch_size
+            vectors.extend(self.embeddings.embed_documents(texts[start:end]))
+            print(f"Embedded {min(end, len(texts))}/{len(texts)} chunks")
+        
+        return np.asarray(vectors, dtype=np.float32)
+    
+    def _embed_texts_in_processes(self, texts: List[str]) -> np.ndarray:
+        """Embed batches of texts in EMBED_WORKERS single-threaded processes, keeping input order"""
+        import multiprocessing
+        
+        batches = [
+            texts[start:start + self.embed_batch_size]
+            for start in range(0, len(texts), self.embed_batch_size)
+        ]
+        vectors = []
+        done = 0
+        
+        # spawn rather than fork: forking after torch has started its thread pools can hang
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(
+            processes=config.EMBED_WORKERS,
+            initializer=_init_embed_worker,
+            initargs=(config.EMBEDDING_MODEL, self._local_device()[1])
+        ) as pool:
+            for batch_vectors in pool.imap(_embed_in_worker, batches):
+                vectors.append(batch_vectors)
+                done += len(batch_vectors)
+                print(f"Embedded {done}/{len(texts)} chunks")
+        
+        return np.concatenate(vectors)
+    
+    async def _embed_texts_concurrently(self, texts: List[str]) -> np.ndarray:
+        """Embed batches with up to EMBED_CONCURRENCY requests in flight, keeping input order"""
+        semaphore = asyncio.Semaphore(config.EMBED_CONCURRENCY)
+        done = 0
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            nonlocal done
+            async with semaphore:
+                vectors = await self.embeddings.aembed_documents(batch)
+            done += len(batch)
+            print(f"Embedded {done}/{len(texts)} chunks")
+            return vectors
+        
+        batches = [
+            texts[start:start + self.embed_batch_size]
+            for start in range(0, len(texts), self.embed_batch_size)
+        ]
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        
+        return np.asarray([vector for batch in results for vector in batch], dtype=np.float32)
+    
+    @staticmethod
+    def _text_digest(text: str) -> bytes:
+        """Content key for a chunk's embedding"""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    
+    def _embed_corpus(self, texts: List[str]):
+        """
+        Embed every distinct text once, reusing vectors cached by earlier builds
+        
+        Cached vectors come back dequantized from int8, so a rebuild served from the cache
+        indexes approximations of the vectors a clean build would (cosine error well under
+        1%). Rows are quantized once, when first embedded, and kept as-is afterwards, so
+        the error doesn't grow across rebuilds.
+        
+        Returns:
+            Vectors aligned with texts (an Int8Vectors view when everything came from the cache)
+        """
+        digests = [self._text_digest(text) for text in texts]
+        unique_texts = {}
+        for digest, text in zip(digests, texts):
+            unique_texts.setdefault(digest, text)
+        
+        if len(unique_texts) < len(texts):
+            print(f"Skipping {len(texts) - len(unique_texts)} duplicate chunks when embedding")
+        
+        cached_rows, codes, scales = self._load_cached_embeddings()
+        missing = [digest for digest in unique_texts if digest not in cached_rows]
+        
+        if not missing:
+            print(f"Reusing {len(texts)} cached embeddings from {config.EMBEDDING_CACHE_PATH}")
+            rows = [cached_rows[digest] for digest in digests]
+            return Int8Vectors(codes[rows], scales[rows])
+        
+        if cached_rows:
+            print(f"Reusing {len(unique_texts) - len(missing)} cached embeddings, embedding {len(missing)} new chunks")
+        new_vectors = self._embed_texts([unique_texts[digest] for digest in missing])
+        new_rows = {digest: row for row, digest in enumerate(missing)}
+        
+        # New text is indexed with its exact vectors, cached text with the stored approximation
+        vectors = np.empty((len(texts), new_vectors.shape[1]), dtype=np.float32)
+        fresh = [i for i, digest in enumerate(digests) if digest in new_rows]
+        vectors[fresh] = new_vectors[[new_rows[digests[i]] for i in fresh]]
+        reused = [i for i, digest in enumerate(digests) if digest not in new_rows]
+        if reused:
+            vectors[reused] = Int8Vectors(codes, scales)[[cached_rows[digests[i]] for i in reused]]
+        
+        # Append the new rows; existing codes and scales are kept rather than requantized,
+        # and entries for texts dropped from this corpus survive too
+        new_codes, new_scales = quantize_int8(new_vectors)
+        if cached_rows:
+            new_codes = np.concatenate([codes, new_codes])
+            new_scales = np.concatenate([scales, new_scales])
+        codes = None  # release the memory map before the cache file is rewritten
+        self._save_cached_embeddings(list(cached_rows) + missing, new_codes, new_scales)
+        
+        return vectors
+    
+    def _load_cached_embeddings(self):
+        """
+        Memory-map the embedding cache if it was built with the current embedding model
+        
+        Returns:
+            Tuple of (digest -> row dict, int8 codes, (N, 1) scales); the dict is empty if
+            there is no usable cache
+        """
+        cache_path = config.EMBEDDING_CACHE_PATH
+        keys_path = cache_path.with_suffix('.keys.npy')
+        scales_path = cache_path.with_suffix('.scales.npy')
+        info_path = cache_path.with_suffix('.json')
+        
+        if not all(path.exists() for path in (cache_path, keys_path, scales_path, info_path)):
+            return {}, None, None
+        
+        try:
+            info = json.loads(info_path.read_text(encoding='utf-8'))
+            if info.get("embedding_model") != config.EMBEDDING_MODEL:
+                return {}, None, None
+            
+            codes = np.load(cache_path, mmap_mode='r')
+            scales = np.load(scales_path)
+            keys = np.load(keys_path).tobytes()
+            rows = {keys[i:i + 16]: row for row, i in enumerate(range(0, len(keys), 16))}
+            if not len(rows) == len(codes) == len(scales):
+                raise ValueError("embedding cache keys, codes and scales do not match")
+            return rows, codes, scales
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable embedding cache: {e}")
+            return {}, None, None
+    
+    def _save_cached_embeddings(self, digests: List[bytes], codes: np.ndarray, scales: np.ndarray):
+        """Persist int8 codes and their per-row scales keyed by text digest so rebuilds only embed new text"""
+        cache_path = config.EMBEDDING_CACHE_PATH
+        keys = np.frombuffer(b"".join(digests), dtype=np.uint8).reshape(len(digests), 16)
+        
+        try:
+            np.save(cache_path, codes)
+            np.save(cache_path.with_suffix('.scales.npy'), scales)
+            np.save(cache_path.with_suffix('.keys.npy'), keys)
+            cache_path.with_suffix('.json').write_text(
+                json.dumps({"embedding_model": config.EMBEDDING_MODEL}), encoding='utf-8'
+            )
+        except OSError as e:
+            print(f"Warning: Could not write embedding cache: {e}")
+    
+    @staticmethod
+    def _document_id(doc: Document) -> str:
+        """Build a stable vector store id for a chunk"""
+        metadata = doc.metadata
+        start_index = metadata.get('start_index', 0)
+        
+        if 'book' in metadata:
+            return f"{metadata['book']}-{metadata.get('chapter')}-{metadata.get('verse')}-{start_index}"
+        
+        digest = hashlib.sha1(doc.page_content.encode('utf-8')).hexdigest()
+        return f"{digest}-{start_index}"
+    
+    @staticmethod
+    def index_manifest(source_path) -> Dict:
+        """
+        Describe the vector store that indexing source_path with the current settings produces
+        
+        Args:
+            source_path: Bible data file the documents are built from
+            
+        Returns:
+            Dictionary to compare against the manifest saved with an existing vector store
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        with open(source_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        
+        return {
+            "source_blake2b": digest.hexdigest(),
+            "embedding_model": config.EMBEDDING_MODEL,
+            "vector_store": config.VECTOR_STORE,
+            "vector_dtype": config.VECTOR_DTYPE,
+            # search_ef is left out: it is applied to an existing index on load
+            "hnsw": [config.HNSW_M, config.HNSW_CONSTRUCTION_EF],
+        }
+    
+    @staticmethod
+    def index_is_current(manifest: Dict) -> bool:
+        """True if a complete vector store was already built from the same data and settings"""
+        if not config.CHROMA_READY_FILE.is_file() or not config.CHROMA_MANIFEST_FILE.is_file():
+            return False
+        
+        try:
+            return json.loads(config.CHROMA_MANIFEST_FILE.read_text(encoding='utf-8')) == manifest
+        except (OSError, ValueError):
+            return False
+    
+    @staticmethod
+    def save_index_manifest(manifest: Dict):
+        """Record what the vector store was built from, after a successful build"""
+        config.CHROMA_MANIFEST_FILE.write_text(json.dumps(manifest), encoding='utf-8')
+    
+    def rebuild_index_if_stale(self, source_path, documents_factory: Callable[[], Iterable[Document]]) -> bool:
+        """
+        Build the vector store from scratch unless it was already built from this file and settings
+        
+        Args:
+            source_path: Bible data file the documents are built from; if it doesn't exist
+                (fallback data), the index is always rebuilt and no manifest is saved
+            documents_factory: Returns the verse documents to index; only called when rebuilding
+            
+        Returns:
+            True if the vector store was rebuilt, False if it was already up to date
+        """
+        manifest = self.index_manifest(source_path) if os.path.exists(source_path) else None
+        if manifest is not None and self.index_is_current(manifest):
+            return False
+        
+        documents = documents_factory()
+        
+        if config.CHROMA_DB_DIR.exists():
+            print("   Removing existing vector store...")
+            shutil.rmtree(config.CHROMA_DB_DIR)
+        
+        # Verse documents are already atomic, so skip the text splitter
+        self.create_vectorstore(documents, presplit=True)
+        if manifest is not None:
+            self.save_index_manifest(manifest)
+        return True
+    
+    def load_existing_vectorstore(self) -> Optional[VectorStore]:
         """
         Load existing vector store from disk
         
         Returns:
-            Loaded Chroma vector store or None if not found
+            Loaded vector store or None if not found
         """
-        chroma_path = Path(config.CHROMA_DB_PATH)
+        chroma_path = config.CHROMA_DB_DIR
         
         if not chroma_path.exists():
             print(f"No existing vector store found at {chroma_path}")
             return None
         
         try:
-            self.vectorstore = Chroma(
-                persist_directory=config.CHROMA_DB_PATH,
-                embedding_function=self.embeddings
-            )
+            if config.VECTOR_STORE == "flat":
+                self.vectorstore = FlatVectorStore.load(self.embeddings, config.CHROMA_DB_PATH)
+                if self.vectorstore is None:
+                    print(f"No flat vector store found at {chroma_path}")
+                    return None
+            else:
+                from langchain_chroma import Chroma
+                
+                self.vectorstore = Chroma(
+                    persist_directory=config.CHROMA_DB_PATH,
+                    embedding_function=self.embeddings
+                )
+                self._apply_search_ef()
             
             # Check if vectorstore has documents
-            if self.vectorstore._collection.count() == 0:
+            if self._document_count() == 0:
                 print("Vector store exists but is empty")
                 return None
             
@@ -164,17 +716,36 @@ class BiblicalRAGEngine:
             self.retriever = self.vectorstore.as_retriever(
                 search_kwargs={"k": config.RETRIEVAL_K}
             )
+            self._setup_keyword_index()
             
             # Create RAG chain
             self._create_rag_chain()
             
-            print(f"Loaded existing vector store with {self.vectorstore._collection.count()} documents")
+            print(f"Loaded existing vector store with {self._document_count()} documents")
             return self.vectorstore
             
         except Exception as e:
             print(f"Error loading vector store: {e}")
             return None
     
+    def _apply_search_ef(self):
+        """Store HNSW_SEARCH_EF on a loaded Chroma collection if it was built with another value"""
+        collection = self.vectorstore._collection
+        try:
+            current = collection.configuration["hnsw"]["ef_search"]
+            if current != config.HNSW_SEARCH_EF:
+                collection.modify(configuration={"hnsw": {"ef_search": config.HNSW_SEARCH_EF}})
+                print(f"Updated HNSW search_ef from {current} to {config.HNSW_SEARCH_EF}")
+        except Exception as e:
+            # Older chromadb releases can't change it after creation
+            print(f"Warning: Could not update HNSW search_ef: {e}")
+    
+    def _document_count(self) -> int:
+        """Number of documents in the loaded vector store"""
+        if isinstance(self.vectorstore, FlatVectorStore):
+            return self.vectorstore.count()
+        return self.vectorstore._collection.count()
+    
     def _create_rag_chain(self):
         """Create the RAG chain for question answering"""
         if not self.retriever:
@@ -182,25 +753,139 @@ class BiblicalRAGEngine:
         
         def format_docs(docs):
             """Format retrieved documents for context"""
-            formatted = []
+            buffer = io.StringIO()
             for doc in docs:
-                # Extract metadata for reference
-                metadata = doc.metadata
-                reference = metadata.get('reference', 'Unknown Reference')
-                content = doc.page_content
-                
-                formatted.append(f"[{reference}] {content}")
+                # The reference is stored on each verse at seed time
+                buffer.write("[")
+                buffer.write(doc.metadata.get('reference', 'Unknown Reference'))
+                buffer.write("] ")
+                buffer.write(doc.page_content)
+                buffer.write("\n\n")
             
-            return "\n\n".join(formatted)
+            # Drop the separator after the last document
+            return buffer.getvalue()[:-2]
         
         # Create the RAG chain
         self.rag_chain = (
-            {"context": self.retriever | format_docs, "question": RunnablePassthrough()}
+            {"context": RunnableLambda(self._retrieve) | format_docs, "question": RunnablePassthrough()}
             | self.prompt
             | self.llm
             | StrOutputParser()
         )
     
+    def _embed_query(self, question: str) -> List[float]:
+        """Embed and L2-normalize a question, reusing the vector if it was embedded recently"""
+        with self._answer_cache_lock:
+            vector = self._query_vectors.get(question)
+        if vector is not None:
+            return vector
+        
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        vector = (vector / (np.linalg.norm(vector) + 1e-12)).tolist()
+        with self._answer_cache_lock:
+            self._query_vectors[question] = vector
+            while len(self._query_vectors) > QUERY_VECTOR_CACHE_SIZE:
+                self._query_vectors.popitem(last=False)
+        return vector
+    
+    def _retrieve(self, question: str) -> List[Document]:
+        """Retrieve context documents for a question, with optional hybrid fusion and reranking"""
+        k = config.RETRIEVAL_K
+        if self.reranker is not None:
+            k *= RERANK_FETCH_FACTOR
+        
+        fetch_k = k if self.bm25 is None else max(k, config.RETRIEVAL_K * HYBRID_FETCH_FACTOR)
+        docs = self.vectorstore.similarity_search_by_vector(self._embed_query(question), k=fetch_k)
+        
+        if self.bm25 is not None:
+            docs = self._fuse_keyword_matches(question, docs, k)
+        
+        if self.reranker is not None:
+            docs = self._rerank(question, docs)
+        return docs
+    
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        """Lowercased word tokens for BM25, so "John 3:16" becomes john, 3, 16"""
+        return _TOKEN_RE.findall(text.lower())
+    
+    def _setup_keyword_index(self):
+        """Build the in-memory BM25 index over the stored verses for hybrid search"""
+        self.bm25 = None
+        self._keyword_docs = []
+        if not config.HYBRID_SEARCH:
+            return
+        
+        try:
+            from rank_bm25 import BM25Okapi
+            
+            stored = self.vectorstore.get(include=["documents", "metadatas"])
+            self._keyword_docs = [
+                Document(page_content=text, metadata=metadata or {}, id=doc_id)
+                for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+            ]
+            # Index the reference with the text so queries naming a verse match it
+            self.bm25 = BM25Okapi([
+                self._tokenize(f"{doc.metadata.get('reference', '')} {doc.page_content}")
+                for doc in self._keyword_docs
+            ])
+        except Exception as e:
+            print(f"Warning: Could not build keyword index for hybrid search: {e}")
+            print("Continuing with dense retrieval only...")
+            self.bm25 = None
+            self._keyword_docs = []
+    
+    def _fuse_keyword_matches(self, question: str, dense_docs: List[Document], k: int) -> List[Document]:
+        """Merge dense and BM25 rankings with Reciprocal Rank Fusion and keep the top k"""
+        tokens = self._tokenize(question)
+        if not tokens or not self._keyword_docs:
+            return dense_docs[:k]
+        
+        scores = self.bm25.get_scores(tokens)
+        fetch_k = min(max(len(dense_docs), k), len(scores))
+        top = np.argpartition(-scores, fetch_k - 1)[:fetch_k]
+        top = top[np.argsort(-scores[top])]
+        keyword_docs = [self._keyword_docs[i] for i in top if scores[i] > 0]
+        
+        fused: Dict[str, float] = {}
+        docs_by_key: Dict[str, Document] = {}
+        for ranking in (dense_docs, keyword_docs):
+            for rank, doc in enumerate(ranking, start=1):
+                key = doc.id or doc.page_content
+                fused[key] = fused.get(key, 0.0) + 1.0 / (RRF_K + rank)
+                docs_by_key.setdefault(key, doc)
+        
+        best = sorted(fused, key=fused.get, reverse=True)[:k]
+        return [docs_by_key[key] for key in best]
+    
+    def _rerank(self, question: str, docs: List[Document]) -> List[Document]:
+        """Keep the RETRIEVAL_K documents the cross-encoder scores highest for the question"""
+        if len(docs) <= 1:
+            return docs
+        
+        scores = self.reranker.predict(
+            [(question, doc.page_content) for doc in docs],
+            batch_size=32,
+            show_progress_bar=False
+        )
+        order = np.argsort(-np.asarray(scores))[:config.RETRIEVAL_K]
+        return [docs[i] for i in order]
+    
+    def _lookup_similar_answer(self, question: str, key: str) -> Optional[str]:
+        """Return the answer to a semantically equivalent earlier question, if any"""
+        if self._semantic_cache is None:
+            return None
+        
+        try:
+            answer = self._semantic_cache.lookup(self._embed_query(question), key)
+        except Exception as e:
+            print(f"Warning: Semantic cache lookup failed: {e}")
+            return None
+        
+        if answer is not None:
+            self._cache_answer(key, answer)
+        return answer
+    
     @traceable
     def ask_question(self, question: str) -> str:
         """
@@ -215,11 +900,18 @@ class BiblicalRAGEngine:
         if not self.rag_chain:
             raise ValueError("RAG chain not initialized. Create or load vector store first.")
         
+        key = self._normalize_question(question)
+        cached = self._get_cached_answer(key) or self._lookup_similar_answer(question, key)
+        if cached is not None:
+            return cached
+        
         try:
             response = self.rag_chain.invoke(question)
-            return response
         except Exception as e:
             return f"Error generating response: {str(e)}"
+        
+        self._cache_answer(key, response, question)
+        return response
     
     @traceable
     def ask_question_stream(self, question: str):
@@ -235,11 +927,62 @@ class BiblicalRAGEngine:
         if not self.rag_chain:
             raise ValueError("RAG chain not initialized. Create or load vector store first.")
         
+        key = self._normalize_question(question)
+        cached = self._get_cached_answer(key) or self._lookup_similar_answer(question, key)
+        if cached is not None:
+            for start in range(0, len(cached), REPLAY_CHUNK_CHARS):
+                if start:
+                    time.sleep(REPLAY_CHUNK_DELAY)
+                yield cached[start:start + REPLAY_CHUNK_CHARS]
+            return
+        
+        chunks = []
         try:
             for chunk in self.rag_chain.stream(question):
+                chunks.append(chunk)
                 yield chunk
         except Exception as e:
             yield f"Error generating response: {str(e)}"
+            return
+        
+        self._cache_answer(key, "".join(chunks), question)
+    
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        """Cache key for a question: lowercased with whitespace collapsed"""
+        return " ".join(question.lower().split())
+    
+    def _get_cached_answer(self, key: str) -> Optional[str]:
+        """Return a previously generated answer, marking it as recently used"""
+        with self._answer_cache_lock:
+            answer = self._answer_cache.get(key)
+            if answer is not None:
+                self._answer_cache.move_to_end(key)
+            return answer
+    
+    def _cache_answer(self, key: str, answer: str, question: Optional[str] = None):
+        """
+        Store an answer, evicting the least recently used one when full
+        
+        Args:
+            key: Normalized question
+            answer: Generated answer
+            question: Original question; when given the answer is also added to the semantic cache
+        """
+        if config.ANSWER_CACHE_SIZE <= 0 or not answer:
+            return
+        
+        with self._answer_cache_lock:
+            self._answer_cache[key] = answer
+            self._answer_cache.move_to_end(key)
+            while len(self._answer_cache) > config.ANSWER_CACHE_SIZE:
+                self._answer_cache.popitem(last=False)
+        
+        if question is not None and self._semantic_cache is not None:
+            try:
+                self._semantic_cache.add(self._embed_query(question), answer, key)
+            except Exception as e:
+                print(f"Warning: Could not add answer to semantic cache: {e}")
     
     def get_stats(self) -> Dict:
         """
@@ -252,7 +995,7 @@ class BiblicalRAGEngine:
             return {"status": "No vector store loaded"}
         
         try:
-            count = self.vectorstore._collection.count()
+            count = self._document_count()
             return {
                 "status": "Ready",
                 "document_count": count,
@@ -0,0 +1,134 @@
+"""
+Semantic answer cache
+Finds previously answered questions whose embeddings are nearly identical to a new one
+"""
+import re
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+# Bits per LSH signature; one random hyperplane per bit
+SIGNATURE_BITS = 64
+
+# Signatures further apart than this are not cosine-checked. Two vectors at angle theta
+# differ in about SIGNATURE_BITS * theta / pi bits, so cosine 0.95 is ~6.5 bits on average
+MAX_HAMMING_DISTANCE = 16
+
+# A number and the word before it, e.g. ("john", "3") and ("", "16") in "john 3:16"
+_REFERENCE_RE = re.compile(r"([a-z]+)?\W*?(\d+)")
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def _references(question: str) -> Tuple[Tuple[str, str], ...]:
+    """Scripture references and other numbers in a question, which embeddings barely tell apart"""
+    return tuple(_REFERENCE_RE.findall(question.lower()))
+
+
+def _popcount64(x: np.ndarray) -> np.ndarray:
+    """Branchless SWAR population count of each uint64 in x"""
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return (x * _H01) >> np.uint64(56)
+
+
+class SemanticCache:
+    """
+    Fixed-size cache of (question embedding, answer) pairs with random-projection LSH
+
+    A lookup hashes the query into a 64-bit signature, keeps only entries within
+    MAX_HAMMING_DISTANCE bits, and returns the answer of the closest one if its cosine
+    similarity reaches the threshold and its question cites the same references
+    ("John 3:16" and "John 3:17" embed almost identically). When full, the oldest entry
+    is overwritten.
+    """
+
+    def __init__(self, capacity: int, threshold: float, seed: int = 0):
+        self.capacity = capacity
+        self.threshold = threshold
+        self._seed = seed
+        self._lock = threading.Lock()
+
+        # Allocated on the first insert, once the embedding dimension is known
+        self._planes = None
+        self._vectors = None
+        self._signatures = np.zeros(capacity, dtype=np.uint64)
+        self._answers: List[Optional[str]] = [None] * capacity
+        self._references: List[Tuple[Tuple[str, str], ...]] = [()] * capacity
+        self._size = 0
+        self._next = 0
+
+    def _signature(self, vector: np.ndarray) -> np.uint64:
+        """Pack the signs of the hyperplane projections into one uint64"""
+        bits = np.packbits(self._planes @ vector > 0, bitorder='little')
+        return bits.view(np.uint64)[0]
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    def lookup(self, vector, question: str = "") -> Optional[str]:
+        """
+        Find the cached answer for a semantically equivalent question
+
+        Args:
+            vector: Embedding of the new question
+            question: Text of the new question, to compare its references with cached ones
+
+        Returns:
+            Cached answer, or None if no entry is similar enough
+        """
+        with self._lock:
+            if self._size == 0:
+                return None
+
+            query = self._normalize(vector)
+            if query.shape[0] != self._vectors.shape[1]:
+                return None
+
+            distances = _popcount64(self._signatures[:self._size] ^ self._signature(query))
+            references = _references(question)
+            candidates = np.array(
+                [i for i in np.flatnonzero(distances <= MAX_HAMMING_DISTANCE) if self._references[i] == references],
+                dtype=np.intp
+            )
+            if candidates.size == 0:
+                return None
+
+            scores = self._vectors[candidates] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            return self._answers[candidates[best]]
+
+    def add(self, vector, answer: str, question: str = ""):
+        """Remember the answer to a question with the given embedding and text"""
+        if self.capacity <= 0 or not answer:
+            return
+
+        with self._lock:
+            vector = self._normalize(vector)
+
+            if self._vectors is None:
+                rng = np.random.default_rng(self._seed)
+                self._planes = rng.standard_normal((SIGNATURE_BITS, vector.shape[0])).astype(np.float32)
+                self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            elif vector.shape[0] != self._vectors.shape[1]:
+                return
+
+            slot = self._next
+            self._vectors[slot] = vector
+            self._signatures[slot] = self._signature(vector)
+            self._answers[slot] = answer
+            self._references[slot] = _references(question)
+
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
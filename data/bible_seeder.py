@@ -3,7 +3,10 @@ Bible Data Seeder
 Handles loading, processing, and seeding biblical texts into the vector database
 """
 import json
-from typing import List, Dict, Optional
+import ijson
+import numpy as np
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 import sys
 # Add project root to path for imports
@@ -11,11 +14,32 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from config.settings import config
 
+def _flatten_books(books: Iterable[Dict]) -> Iterator[Tuple[str, int, int, str]]:
+    """
+    Walk nested book -> chapter -> verse data
+    
+    Args:
+        books: Book dictionaries as found under "books" in KJV.json (may be streamed)
+        
+    Yields:
+        (book name, chapter number, verse number, verse text) for every verse in order
+    """
+    for book in books:
+        book_name = book["name"]
+        
+        for chapter in book["chapters"]:
+            chapter_num = chapter["chapter"]
+            
+            for verse in chapter["verses"]:
+                yield book_name, chapter_num, verse["verse"], verse["text"]
+
+
 class BibleDataSeeder:
     """Handles loading and processing biblical data"""
     
     def __init__(self):
         self.data_path = Path(config.BIBLE_DATA_PATH)
+        self.cache_path = config.VERSE_CACHE_PATH
     
     def create_sample_bible_data(self) -> Dict:
         """Create minimal sample Bible data as fallback only"""
@@ -46,38 +70,177 @@ class BibleDataSeeder:
         Returns:
             List of verse dictionaries in flat format
         """
+        return self.load_verse_table().to_pylist()
+    
+    def load_verse_table(self):
+        """
+        Load the complete KJV Bible as a columnar table
+        
+        Verses are stored column-wise (dictionary-encoded book and translation, int16
+        chapter and verse, and one contiguous text buffer with offsets) and memory-mapped
+        from the cache file, so no per-verse Python objects exist until rows are read.
+        
+        Returns:
+            pyarrow.Table with book, chapter, verse, text and translation columns
+        """
         if not self.data_path.exists():
             raise FileNotFoundError(f"KJV.json not found at {self.data_path}")
         
+        cached = self.load_cached()
+        if cached is not None:
+            return cached
+        
         print(f"Loading complete KJV Bible data from {self.data_path}...")
         
-        with open(self.data_path, 'r', encoding='utf-8') as f:
-            kjv_data = json.load(f)
+        # Parse one book at a time instead of materializing the whole JSON tree
+        with open(self.data_path, 'rb') as f:
+            translation = self._read_translation(f)
+            f.seek(0)
+            table = self._verse_table_from_books(ijson.items(f, 'books.item'), translation)
+        
+        print(f"Successfully loaded {table.num_rows} verses from complete KJV Bible")
+        self.save_cache(table)
+        return table
+    
+    def verse_table_from_data(self, bible_data: Dict):
+        """
+        Build the verse table from an already parsed KJV.json tree; pass it to save_cache
+        so the next load doesn't parse the file again
+        
+        Args:
+            bible_data: Parsed contents of KJV.json
+            
+        Returns:
+            pyarrow.Table of the verses
+            
+        Raises:
+            KeyError, TypeError: If the data doesn't have the KJV.json structure
+        """
+        return self._verse_table_from_books(bible_data["books"], bible_data.get("translation"))
+    
+    @staticmethod
+    def _read_translation(f) -> Optional[str]:
+        """Read the top-level "translation" field, stopping once the books start"""
+        for prefix, event, value in ijson.parse(f):
+            if prefix == 'translation':
+                return value
+            if prefix == 'books' and event == 'start_array':
+                return None
+        return None
+    
+    @classmethod
+    def _verse_table_from_books(cls, books: Iterable[Dict], translation: Optional[str] = None):
+        """
+        Accumulate verse columns from book dictionaries without creating a dict per verse
+        
+        Args:
+            books: Book dictionaries as found under "books" in KJV.json
+            translation: Top-level "translation" field of the file, kept as table metadata
+        """
+        book_names = []
+        book_ids = array('h')
+        chapters = array('h')
+        verse_nums = array('h')
+        text_offsets = array('i', [0])
+        text_data = bytearray()
+        
+        for book_name, chapter_num, verse_num, text in _flatten_books(books):
+            if not book_names or book_names[-1] != book_name:
+                book_names.append(book_name)
+            
+            book_ids.append(len(book_names) - 1)
+            chapters.append(chapter_num)
+            verse_nums.append(verse_num)
+            text_data += text.encode('utf-8')
+            text_offsets.append(len(text_data))
+        
+        table = cls._build_verse_table(book_names, book_ids, chapters, verse_nums, text_offsets, text_data)
+        if translation is not None:
+            table = table.replace_schema_metadata({"translation": translation})
+        return table
+    
+    @staticmethod
+    def _build_verse_table(book_names, book_ids, chapters, verse_nums, text_offsets, text_data):
+        """Assemble parsed verse columns into a pyarrow.Table without copying the text"""
+        import pyarrow as pa
+        
+        num_verses = len(book_ids)
+        books = pa.DictionaryArray.from_arrays(
+            pa.array(book_ids, type=pa.int16()), pa.array(book_names, type=pa.string())
+        )
+        texts = pa.StringArray.from_buffers(
+            num_verses, pa.py_buffer(text_offsets), pa.py_buffer(text_data)
+        )
+        translations = pa.DictionaryArray.from_arrays(
+            pa.array(bytes(num_verses), type=pa.int8()), pa.array(["KJV"])
+        )
+        
+        return pa.table({
+            "book": books,
+            "chapter": pa.array(chapters, type=pa.int16()),
+            "verse": pa.array(verse_nums, type=pa.int16()),
+            "text": texts,
+            "translation": translations,
+        })
+    
+    @staticmethod
+    def _source_stamp(source_path: Path) -> Dict[str, str]:
+        """Identify a source file by resolved path, size and modification time"""
+        stat = source_path.stat()
+        return {
+            "source_path": str(source_path.resolve()),
+            "source_size": str(stat.st_size),
+            "source_mtime_ns": str(stat.st_mtime_ns),
+        }
+    
+    def load_cached(self):
+        """
+        Memory-map the verse table saved by a previous load, if it was built from
+        BIBLE_DATA_PATH and the file hasn't changed since
+        
+        Returns:
+            pyarrow.Table, or None if there is no usable cache
+        """
+        if not self.cache_path.exists():
+            return None
         
-        # Convert nested structure to flat list
-        verses = []
-        for book in kjv_data["books"]:
-            book_name = book["name"]
+        try:
+            import pyarrow as pa
+            
+            table = pa.ipc.open_file(pa.memory_map(str(self.cache_path))).read_all()
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable verse cache: {e}")
+            return None
+        
+        metadata = {key.decode('utf-8'): value.decode('utf-8') for key, value in (table.schema.metadata or {}).items()}
+        stamp = self._source_stamp(self.data_path)
+        if any(metadata.get(key) != value for key, value in stamp.items()):
+            return None
+        
+        print(f"Loaded {table.num_rows} verses from cache {self.cache_path}")
+        return table
+    
+    def save_cache(self, table, source_path: Optional[Path] = None):
+        """
+        Save the verse table as an Arrow IPC file so later loads can memory-map it
+        
+        Args:
+            table: Verse table to save
+            source_path: File the table was built from (default: BIBLE_DATA_PATH); its
+                identity is stored with the table so a cache of another file is never used
+        """
+        try:
+            import pyarrow as pa
+            
+            metadata = {key.decode('utf-8'): value.decode('utf-8') for key, value in (table.schema.metadata or {}).items()}
+            metadata.update(self._source_stamp(Path(source_path or self.data_path)))
+            table = table.replace_schema_metadata(metadata)
             
-            for chapter in book["chapters"]:
-                chapter_num = chapter["chapter"]
-                
-                for verse in chapter["verses"]:
-                    verse_num = verse["verse"]
-                    verse_text = verse["text"]
-                    
-                    # Create verse dictionary in expected format
-                    verse_dict = {
-                        "book": book_name,
-                        "chapter": chapter_num,
-                        "verse": verse_num,
-                        "text": verse_text,
-                        "translation": "KJV"
-                    }
-                    verses.append(verse_dict)
-        
-        print(f"Successfully loaded {len(verses)} verses from complete KJV Bible")
-        return verses
+            with pa.OSFile(str(self.cache_path), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        except Exception as e:
+            print(f"Warning: Could not write verse cache: {e}")
 
     def save_sample_data(self):
         """Save minimal sample data as fallback"""
@@ -101,9 +264,18 @@ class BibleDataSeeder:
         Returns:
             List of verse dictionaries
         """
+        return self.load_bible_table().to_pylist()
+    
+    def load_bible_table(self):
+        """
+        Load complete KJV Bible data as a columnar table, with fallback to minimal sample
+        
+        Returns:
+            pyarrow.Table with book, chapter, verse, text and translation columns
+        """
         try:
             # Always try to load complete KJV Bible first
-            return self.load_kjv_data()
+            return self.load_verse_table()
             
         except FileNotFoundError:
             print(f"⚠️  KJV.json not found at {self.data_path}")
@@ -111,60 +283,47 @@ class BibleDataSeeder:
             
             # Create and convert sample data
             sample_data = self.create_sample_bible_data()
+            table = self._verse_table_from_books(sample_data["books"], sample_data.get("translation"))
             
-            # Convert structure to flat format
-            verses = []
-            for book in sample_data["books"]:
-                book_name = book["name"]
-                
-                for chapter in book["chapters"]:
-                    chapter_num = chapter["chapter"]
-                    
-                    for verse in chapter["verses"]:
-                        verse_num = verse["verse"]
-                        verse_text = verse["text"]
-                        
-                        verse_dict = {
-                            "book": book_name,
-                            "chapter": chapter_num,
-                            "verse": verse_num,
-                            "text": verse_text,
-                            "translation": "KJV"
-                        }
-                        verses.append(verse_dict)
-            
-            print(f"Using minimal fallback data: {len(verses)} verse(s)")
+            print(f"Using minimal fallback data: {table.num_rows} verse(s)")
             print("💡 Please add KJV.json to data/ directory for complete Bible")
-            return verses
+            return table
     
     def get_bible_stats(self) -> Dict:
         """Get statistics about the KJV Bible data"""
         if not self.data_path.exists():
             return {"error": "KJV.json not found"}
         
-        with open(self.data_path, 'r', encoding='utf-8') as f:
-            kjv_data = json.load(f)
+        # Count from the verse table, which later loads reuse, instead of
+        # parsing KJV.json once for the stats and again for the verses
+        table = self.load_verse_table()
+        
+        books = table.column("book").combine_chunks()
+        book_ids = books.indices.to_numpy(zero_copy_only=False)
+        chapters = table.column("chapter").to_numpy()
+        
+        # A chapter starts wherever the book or chapter number changes
+        chapter_starts = np.ones(len(book_ids), dtype=bool)
+        chapter_starts[1:] = (book_ids[1:] != book_ids[:-1]) | (chapters[1:] != chapters[:-1])
+        
+        num_books = len(books.dictionary)
+        verses_per_book = np.bincount(book_ids, minlength=num_books)
+        chapters_per_book = np.bincount(book_ids[chapter_starts], minlength=num_books)
         
+        metadata = table.schema.metadata or {}
         stats = {
-            "translation": kjv_data.get("translation", "Unknown"),
-            "total_books": len(kjv_data["books"]),
-            "total_chapters": 0,
-            "total_verses": 0,
-            "books": []
+            "translation": metadata.get(b"translation", b"Unknown").decode('utf-8'),
+            "total_books": num_books,
+            "total_chapters": int(chapters_per_book.sum()),
+            "total_verses": table.num_rows,
+            "books": [
+                {"name": name, "chapters": int(num_chapters), "verses": int(num_verses)}
+                for name, num_chapters, num_verses in zip(
+                    books.dictionary.to_pylist(), chapters_per_book, verses_per_book
+                )
+            ]
         }
         
-        for book in kjv_data["books"]:
-            book_chapters = len(book["chapters"])
-            book_verses = sum(len(chapter["verses"]) for chapter in book["chapters"])
-            
-            stats["total_chapters"] += book_chapters
-            stats["total_verses"] += book_verses
-            stats["books"].append({
-                "name": book["name"],
-                "chapters": book_chapters,
-                "verses": book_verses
-            })
-        
         return stats
 
 
@@ -3,16 +3,25 @@
 Download KJV Bible data and setup RAG system for Streamlit deployment
 """
 
+import io
 import sys
 import time
 import requests
 import json
 from pathlib import Path
-import shutil
 
-import pysqlite3
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 import sys
-sys.modules["sqlite3"] = sys.modules["pysqlite3"]
+try:
+    import pysqlite3
+    sys.modules["sqlite3"] = sys.modules["pysqlite3"]
+except ImportError:
+    # Only needed where the system sqlite3 is too old for Chroma
+    pass
 
 # Add project root to path
 sys.path.append(str(Path(__file__).parent.parent))
@@ -23,6 +32,20 @@ from core.rag_engine import BiblicalRAGEngine
 from config.settings import config
 
 
+# Bytes per read from the download stream; 8 KiB reads meant ~600 Python iterations for KJV.json
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# (connect, read) timeouts in seconds, so a stalled connection fails setup instead of hanging it
+DOWNLOAD_TIMEOUT = (5, 30)
+
+
+def _parse_json(raw):
+    """Parse JSON bytes with orjson when it is installed, else the standard library"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(bytes(raw))
+
+
 def download_kjv_bible(progress_callback=None):
     """Download KJV.json from GitHub repository"""
     
@@ -38,48 +61,110 @@ def download_kjv_bible(progress_callback=None):
         # Create data directory if it doesn't exist
         kjv_path.parent.mkdir(exist_ok=True)
         
-        # Download with progress
-        response = requests.get(kjv_url, stream=True)
-        response.raise_for_status()
-        
-        total_size = int(response.headers.get('content-length', 0))
-        downloaded = 0
+        # Download into a .part file next to an ETag, so an interrupted download can be
+        # resumed and an unchanged file isn't downloaded again
+        part_path = kjv_path.with_name(kjv_path.name + ".part")
+        etag_path = kjv_path.with_suffix(".etag")
+        etag = etag_path.read_text(encoding='utf-8').strip() if etag_path.exists() else None
+        
+        headers = {}
+        resume_from = 0
+        if etag and kjv_path.exists():
+            headers["If-None-Match"] = etag
+        elif etag and part_path.exists():
+            resume_from = part_path.stat().st_size
+            headers["Range"] = f"bytes={resume_from}-"
+            headers["If-Range"] = etag
+            # Byte ranges of a compressed response don't line up with the file on disk
+            headers["Accept-Encoding"] = "identity"
+        
+        # The session closes every connection it opened (github.com and the raw host it
+        # redirects to) once the download is done; requests already asks for gzip
+        with requests.Session() as session:
+            # Download with progress
+            response = session.get(kjv_url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+            
+            if response.status_code == 304:
+                response.close()
+                print("   KJV.json is up to date")
+                if progress_callback:
+                    progress_callback("KJV.json is up to date")
+                return True
+            
+            if response.status_code == 416:
+                # The partial file already holds the whole body (or is stale); download it again from scratch
+                response.close()
+                part_path.unlink(missing_ok=True)
+                response = session.get(kjv_url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+            
+            with response:
+                response.raise_for_status()
+                
+                if response.status_code != 206:
+                    resume_from = 0
+                elif resume_from:
+                    print(f"   Resuming download at {resume_from / 1024 / 1024:.1f} MB")
+                
+                if response.headers.get('etag'):
+                    etag_path.write_text(response.headers['etag'], encoding='utf-8')
+                
+                total_size = int(response.headers.get('content-length', 0))
+                downloaded = 0
+                last_percent = -1
+                
+                # Keep a copy in memory while writing, so validation doesn't read the file back
+                buffer = io.BytesIO()
+                with open(part_path, 'ab' if resume_from else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            buffer.write(chunk)
+                            downloaded += len(chunk)
+                            
+                            # Report only when the whole percentage changes, not on every chunk
+                            if total_size > 0 and progress_callback:
+                                percent = downloaded * 100 // total_size
+                                if percent != last_percent:
+                                    last_percent = percent
+                                    progress_callback(f"Downloading... {percent}% ({downloaded / 1024 / 1024:.1f} MB)")
+        
+        # Content-Length counts encoded bytes, so it can only be checked for identity responses
+        if total_size and 'content-encoding' not in response.headers and downloaded != total_size:
+            print(f"   Download incomplete: got {downloaded} of {total_size} bytes")
+            if progress_callback:
+                progress_callback("Download incomplete, run setup again to resume")
+            return False
         
-        with open(kjv_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    
-                    if total_size > 0 and progress_callback:
-                        percent = (downloaded / total_size) * 100
-                        progress_callback(f"Downloading... {percent:.1f}% ({downloaded / 1024 / 1024:.1f} MB)")
+        print(f"   Downloaded {downloaded / 1024 / 1024:.1f} MB")
         
-        print(f"   Downloaded {kjv_path.stat().st_size / 1024 / 1024:.1f} MB")
+        raw = part_path.read_bytes() if resume_from else buffer.getbuffer()
         
-        # Validate JSON
+        # Validate the JSON and its structure before installing it as KJV.json, and keep
+        # the parsed verses so the seeder doesn't parse the file again
+        seeder = BibleDataSeeder()
         try:
-            with open(kjv_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            verse_count = sum(
-                len(verse['verses']) 
-                for book in data['books'] 
-                for verse in book['chapters']
-            )
-            
-            print(f"   Validation successful: {verse_count} verses found")
-            
+            verse_table = seeder.verse_table_from_data(_parse_json(raw))
+        except (ValueError, KeyError, TypeError) as e:
+            # JSONDecodeError (json and orjson) is a ValueError
+            print(f"   Invalid KJV data downloaded: {e}")
+            if part_path.exists():
+                part_path.unlink()
+            if etag_path.exists():
+                etag_path.unlink()
             if progress_callback:
-                progress_callback(f"Downloaded complete! {verse_count} verses ready")
-            
-            return True
-            
-        except json.JSONDecodeError as e:
-            print(f"   Invalid JSON downloaded: {e}")
-            if kjv_path.exists():
-                kjv_path.unlink()
+                progress_callback("Downloaded data is invalid, run setup again to retry")
             return False
+        
+        part_path.replace(kjv_path)
+        seeder.save_cache(verse_table, kjv_path)
+        verse_count = verse_table.num_rows
+        
+        print(f"   Validation successful: {verse_count} verses found")
+        
+        if progress_callback:
+            progress_callback(f"Downloaded complete! {verse_count} verses ready")
+        
+        return True
             
     except requests.RequestException as e:
         print(f"   Download failed: {e}")
@@ -125,60 +210,73 @@ def setup_bible_data_with_download(progress_callback=None):
             file_size = kjv_path.stat().st_size / 1024 / 1024
             if progress_callback:
                 progress_callback(f"KJV.json found ({file_size:.1f} MB)")
+            
+            # With a stored ETag, checking for a newer file is one conditional request (304 if
+            # unchanged); if it fails, carry on with the file we have
+            if kjv_path.with_suffix(".etag").exists() and not download_kjv_bible(progress_callback):
+                print("   Could not check KJV.json for updates, using the existing file")
         
-        # Initialize seeder
-        if progress_callback:
-            progress_callback("Initializing Bible data seeder...")
-        
-        seeder = BibleDataSeeder()
+        rag_engine = BiblicalRAGEngine()
         
-        # Show Bible statistics
-        stats = seeder.get_bible_stats()
-        if "error" not in stats:
-            stats_msg = f"Stats: {stats['total_books']} books, {stats['total_chapters']} chapters, {stats['total_verses']} verses"
-            print(f"   {stats_msg}")
+        def build_documents():
+            """Load the verses and convert them to documents; only needed for a rebuild"""
+            # Initialize seeder
             if progress_callback:
-                progress_callback(stats_msg)
-        
-        # Load Bible data
-        if progress_callback:
-            progress_callback("Loading Bible data...")
-        
-        bible_data = seeder.load_bible_data()
-        
-        if len(bible_data) > 1000:
-            data_msg = f"Loaded complete Bible: {len(bible_data)} verses"
-            print(f"   {data_msg}")
+                progress_callback("Initializing Bible data seeder...")
+            
+            seeder = BibleDataSeeder()
+            
+            # Show Bible statistics
+            stats = seeder.get_bible_stats()
+            if "error" not in stats:
+                stats_msg = f"Stats: {stats['total_books']} books, {stats['total_chapters']} chapters, {stats['total_verses']} verses"
+                print(f"   {stats_msg}")
+                if progress_callback:
+                    progress_callback(stats_msg)
+            
+            # Load Bible data
             if progress_callback:
-                progress_callback(data_msg)
-                progress_callback("Processing embeddings (this may take 5-10 minutes)...")
-        
-        # Convert to documents
-        if progress_callback:
-            progress_callback("Converting to LangChain documents...")
-        
-        documents = DocumentProcessor.create_documents_from_bible_data(bible_data)
-        doc_msg = f"Created {len(documents)} documents"
-        print(f"   {doc_msg}")
-        
-        # Initialize RAG engine
-        if progress_callback:
-            progress_callback("Initializing RAG engine...")
-        
-        rag_engine = BiblicalRAGEngine()
-        
-        # Create vector database
-        if progress_callback:
-            progress_callback("Creating vector database (this is the slow part)...")
+                progress_callback("Loading Bible data...")
+            
+            bible_data = seeder.load_bible_table()
+            
+            if len(bible_data) > 1000:
+                data_msg = f"Loaded complete Bible: {len(bible_data)} verses"
+                print(f"   {data_msg}")
+                if progress_callback:
+                    progress_callback(data_msg)
+                    progress_callback("Processing embeddings (this may take 5-10 minutes)...")
+            
+            # Convert to documents
+            if progress_callback:
+                progress_callback("Converting to LangChain documents...")
+            
+            documents = DocumentProcessor.create_documents_from_bible_data(bible_data)
+            doc_msg = f"Created {len(documents)} documents"
+            print(f"   {doc_msg}")
+            
+            # Initialize RAG engine
+            if progress_callback:
+                progress_callback("Initializing RAG engine...")
+            
+            # Create vector database
+            if progress_callback:
+                progress_callback(
+                    f"Creating vector database with {config.HNSW_NUM_THREADS} index threads (this is the slow part)..."
+                )
+            
+            return documents
         
-        # Remove existing vector store if it exists
-        chroma_path = Path(config.CHROMA_DB_PATH)
-        if chroma_path.exists():
+        # Nothing to do if the vector store was already built from this exact file and settings
+        if not rag_engine.rebuild_index_if_stale(kjv_path, build_documents):
+            success_msg = "Setup completed! Vector database is already up to date"
+            print(success_msg)
             if progress_callback:
-                progress_callback("Removing existing vector store...")
-            shutil.rmtree(chroma_path)
+                progress_callback(success_msg)
+                progress_callback("Biblical RAG system is ready!")
+            return True
         
-        vectorstore = rag_engine.create_vectorstore(documents)
+        verse_count = rag_engine.get_stats().get("document_count", 0)
         
         if progress_callback:
             progress_callback("Vector database created successfully!")
@@ -191,8 +289,15 @@ def setup_bible_data_with_download(progress_callback=None):
         
         for question in test_questions:
             try:
-                response = rag_engine.ask_question(question)
-                test_msg = f"Test successful ({len(response)} characters)"
+                if config.RUN_SMOKE_TEST:
+                    response = rag_engine.ask_question(question)
+                    test_msg = f"Test successful ({len(response)} characters)"
+                else:
+                    # Retrieval only: checks the index without an LLM round-trip
+                    matches = rag_engine.vectorstore.similarity_search(question, k=1)
+                    if not matches:
+                        raise ValueError("vector store returned no documents")
+                    test_msg = f"Test successful (top match: {matches[0].metadata.get('reference', '?')})"
                 print(f"   {test_msg}")
                 if progress_callback:
                     progress_callback(test_msg)
@@ -202,15 +307,15 @@ def setup_bible_data_with_download(progress_callback=None):
         # Save processing summary
         summary = {
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "verses_loaded": len(bible_data),
-            "documents_created": len(documents),
+            "verses_loaded": verse_count,
+            "documents_created": verse_count,
             "vector_db_path": config.CHROMA_DB_PATH,
             "processing_time_seconds": time.time() - start_time,
             "auto_downloaded": True
         }
         
         elapsed_time = time.time() - start_time
-        success_msg = f"Setup completed! ({elapsed_time:.1f} seconds, {len(bible_data)} verses)"
+        success_msg = f"Setup completed! ({elapsed_time:.1f} seconds, {verse_count} verses)"
         print(success_msg)
         
         if progress_callback:
@@ -229,15 +334,17 @@ def setup_bible_data_with_download(progress_callback=None):
         return False
 
 
+def print_progress(message):
+    """Progress callback for command-line runs"""
+    # Use ASCII-safe printing for Windows compatibility
+    try:
+        print(f"[PROGRESS] {message}")
+    except UnicodeEncodeError:
+        # Fallback: replace problematic characters
+        safe_message = message.encode('ascii', 'replace').decode('ascii')
+        print(f"[PROGRESS] {safe_message}")
+
+
 if __name__ == "__main__":
-    def print_progress(message):
-        # Use ASCII-safe printing for Windows compatibility
-        try:
-            print(f"[PROGRESS] {message}")
-        except UnicodeEncodeError:
-            # Fallback: replace problematic characters
-            safe_message = message.encode('ascii', 'replace').decode('ascii')
-            print(f"[PROGRESS] {safe_message}")
-    
     success = setup_bible_data_with_download(print_progress)
     sys.exit(0 if success else 1) 
\ No newline at end of file
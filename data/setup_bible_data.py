@@ -51,44 +51,46 @@ def setup_bible_data():
             print(f"\n⚠️  KJV.json not found at {kjv_path}")
             print("   Will use minimal fallback data")
         
-        # Load Bible data (always attempts full KJV, falls back if needed)
-        print(f"\n📖 Loading Bible data...")
-        bible_data = seeder.load_bible_data()
-        
-        if len(bible_data) > 1000:
-            print(f"   ✅ Loaded complete Bible: {len(bible_data)} verses")
-            print("   This will take several minutes to process...")
-        else:
-            print(f"   ⚠️  Using minimal fallback: {len(bible_data)} verses")
-        
-        # Convert to documents
-        print(f"\n📄 Converting to LangChain documents...")
-        documents = DocumentProcessor.create_documents_from_bible_data(bible_data)
-        print(f"   ✅ Created {len(documents)} documents")
-        
         # Initialize RAG engine
         print(f"\n🤖 Initializing RAG engine...")
         rag_engine = BiblicalRAGEngine()
         print("   ✅ RAG engine initialized")
         
-        # Create vector database
-        print(f"\n🔍 Creating vector database...")
+        def build_documents():
+            """Load the verses and convert them to documents; only needed for a rebuild"""
+            # Load Bible data (always attempts full KJV, falls back if needed)
+            print(f"\n📖 Loading Bible data...")
+            bible_data = seeder.load_bible_table()
+            
+            if len(bible_data) > 1000:
+                print(f"   ✅ Loaded complete Bible: {len(bible_data)} verses")
+                print("   This will take several minutes to process...")
+            else:
+                print(f"   ⚠️  Using minimal fallback: {len(bible_data)} verses")
+            
+            # Convert to documents
+            print(f"\n📄 Converting to LangChain documents...")
+            documents = DocumentProcessor.create_documents_from_bible_data(bible_data)
+            print(f"   ✅ Created {len(documents)} documents")
+            
+            # Create vector database
+            print(f"\n🔍 Creating vector database...")
+            return documents
         
-        # Remove existing vector store if it exists
-        import shutil
-        chroma_path = Path(config.CHROMA_DB_PATH)
-        if chroma_path.exists():
-            print(f"   Removing existing vector store...")
-            shutil.rmtree(chroma_path)
+        # Nothing to do if the vector store was already built from this exact file and settings
+        if not rag_engine.rebuild_index_if_stale(kjv_path, build_documents):
+            print(f"\n✅ Vector database is already up to date, skipping rebuild")
+            print(f"   Run: streamlit run app.py")
+            return
         
-        vectorstore = rag_engine.create_vectorstore(documents)
+        verse_count = rag_engine.get_stats().get("document_count", 0)
         print(f"   ✅ Vector database created successfully")
         
 
         elapsed_time = time.time() - start_time
         print(f"\n🎉 Setup completed successfully!")
         print(f"   Processing time: {elapsed_time:.1f} seconds")
-        print(f"   Verses processed: {len(bible_data)}")
+        print(f"   Verses processed: {verse_count}")
         print(f"\n📖 Your Biblical RAG system is ready!")
         print(f"   Run: streamlit run app.py")
         
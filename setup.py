@@ -3,9 +3,7 @@
 Simple setup trigger for Biblical RAG system
 Can be run locally or triggered from Streamlit
 """
-import subprocess
 import sys
-from pathlib import Path
 
 
 def main():
@@ -14,27 +12,25 @@ def main():
     print("🙏 Biblical RAG Quick Setup")
     print("========================")
     
-    setup_script = Path("data/download_and_setup.py")
-    
-    if not setup_script.exists():
-        print("❌ Setup script not found!")
-        sys.exit(1)
-    
     print("🚀 Starting automatic setup...")
     print("This will download KJV Bible data and create embeddings")
     
     try:
-        result = subprocess.run([sys.executable, str(setup_script)], check=True)
-        print("\n🎉 Setup complete!")
-        print("Run the app with: streamlit run app.py")
+        # Run the setup in this interpreter instead of starting a second one
+        from data.download_and_setup import print_progress, setup_bible_data_with_download
         
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ Setup failed with return code {e.returncode}")
-        sys.exit(1)
+        success = setup_bible_data_with_download(print_progress)
     except Exception as e:
         print(f"\n❌ Setup failed: {str(e)}")
         sys.exit(1)
+    
+    if not success:
+        print("\n❌ Setup failed")
+        sys.exit(1)
+    
+    print("\n🎉 Setup complete!")
+    print("Run the app with: streamlit run app.py")
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file